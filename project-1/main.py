@@ -1,4 +1,4 @@
-import sys, json
+import sys, json, os, hashlib, time
 from PySide6 import QtCore
 from PySide6.QtCore import QDate, QFile, Qt, QTextStream
 from PySide6 import QtGui, QtWidgets 
@@ -20,6 +20,47 @@ def cmyk_to_rgb(c, m, y, k):
     b = 255 * (1 - y) * (1 - k)
     return round(r), round(g), round(b)
 
+# Pens and brushes are shared between items instead of created on every paint
+_pens = {}
+_brushes = {}
+
+def cached_pen(color, width=1):
+    key = (color.rgba(), width)
+    pen = _pens.get(key)
+    if pen is None:
+        pen = _pens[key] = QtGui.QPen(color, width)
+    return pen
+
+def cached_brush(color):
+    key = color.rgba()
+    brush = _brushes.get(key)
+    if brush is None:
+        brush = _brushes[key] = QtGui.QBrush(color)
+    return brush
+
+class PaintStats:
+    # Paint calls and time spent per item type
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.counts = {}
+        self.times = {}
+
+    def record(self, name, elapsed):
+        self.counts[name] = self.counts.get(name, 0) + 1
+        self.times[name] = self.times.get(name, 0.0) + elapsed
+
+    def summary(self):
+        if not self.counts:
+            return "Brak danych"
+        lines = []
+        for name in sorted(self.counts):
+            lines.append(f"{name}: {self.counts[name]} x, {self.times[name] * 1000:.2f} ms")
+        return "\n".join(lines)
+
+paint_stats = PaintStats()
+
 class ResizeHandle(QtWidgets.QGraphicsRectItem):
     SIZE = 8
 
@@ -104,6 +145,27 @@ class BaseGraphicsItem(QtWidgets.QGraphicsItem):
     def boundingRect(self):
         return QtCore.QRectF(0, 0, self.width, self.height)
 
+    def paint(self, painter, option, widget=None):
+        # Offscreen renders (thumbnails) have no widget and are not counted
+        if widget is None:
+            self.draw_shape(painter)
+            return
+        start = time.perf_counter()
+        self.draw_shape(painter)
+        paint_stats.record(type(self).__name__, time.perf_counter() - start)
+
+    def draw_shape(self, painter):
+        pass
+
+    # prepareGeometryChange repaints the old and new bounds, no extra update needed
+    def set_params(self, params):
+        self.prepareGeometryChange()
+        self.setX(params[0])
+        self.setY(params[1])
+        self.width = params[2]
+        self.height = params[3]
+        self.update_handles()
+
     def mousePressEvent(self, event):
         if event.button() == QtCore.Qt.MouseButton.RightButton:
             self._dragging = True
@@ -147,9 +209,9 @@ class RectItem(BaseGraphicsItem):
         super().__init__(width, height)
         self.rect_color = QtGui.QColor(color)
 
-    def paint(self, painter, option, widget=None):
-        painter.setBrush(QtGui.QBrush(self.rect_color))
-        painter.setPen(QtGui.QPen(QtGui.QColorConstants.Transparent, 1))
+    def draw_shape(self, painter):
+        painter.setBrush(cached_brush(self.rect_color))
+        painter.setPen(cached_pen(QtGui.QColorConstants.Transparent))
         painter.drawRect(self.boundingRect())
 
     def handle_moved(self, position, scene_pos):
@@ -195,7 +257,6 @@ class RectItem(BaseGraphicsItem):
         self.height = max(10, abs(self.height))
         
         self.update_handles()
-        self.update()
         
     def to_json(self):
         color = self.rect_color
@@ -211,9 +272,9 @@ class EllipseItem(BaseGraphicsItem):
         super().__init__(width, height)
         self.ellipse_color = QtGui.QColor(color)
 
-    def paint(self, painter, option, widget=None):
-        painter.setBrush(QtGui.QBrush(self.ellipse_color))
-        painter.setPen(QtGui.QPen(QtGui.QColorConstants.Transparent, 1))
+    def draw_shape(self, painter):
+        painter.setBrush(cached_brush(self.ellipse_color))
+        painter.setPen(cached_pen(QtGui.QColorConstants.Transparent))
         painter.drawEllipse(self.boundingRect())
 
     def handle_moved(self, position, scene_pos):
@@ -258,7 +319,6 @@ class EllipseItem(BaseGraphicsItem):
         self.height = max(10, abs(self.height))
         
         self.update_handles()
-        self.update()
      
     def to_json(self):
         color = self.ellipse_color
@@ -281,8 +341,8 @@ class LineItem(BaseGraphicsItem):
         padding = 3
         return QtCore.QRectF(self.p1, self.p2).normalized().adjusted(-padding, -padding, padding, padding)
 
-    def paint(self, painter, option, widget=None):
-        painter.setPen(QtGui.QPen(self.line_color, 3))
+    def draw_shape(self, painter):
+        painter.setPen(cached_pen(self.line_color, 3))
         painter.drawLine(self.p1, self.p2)
 
     def handle_moved(self, position, scene_pos):
@@ -317,7 +377,12 @@ class LineItem(BaseGraphicsItem):
                 self.p1 = rect.topRight()
 
         self.update_handles()
-        self.update()
+
+    def set_params(self, params):
+        self.prepareGeometryChange()
+        self.p1 = QtCore.QPointF(params[0], params[1]) - self.pos()
+        self.p2 = QtCore.QPointF(params[2], params[3]) - self.pos()
+        self.update_handles()
     
     def to_json(self):
         color = self.line_color
@@ -340,6 +405,196 @@ class CustomScene(QtWidgets.QGraphicsScene):
         super().mousePressEvent(event)
 
 
+SCENE_SIZE = (540, 780)
+THUMBNAIL_SIZE = (135, 195)
+
+UpdateMode = QtWidgets.QGraphicsView.ViewportUpdateMode
+VIEWPORT_UPDATE_MODES = {
+    "Minimalne": UpdateMode.MinimalViewportUpdate,
+    "Inteligentne": UpdateMode.SmartViewportUpdate,
+    "Prostokąt otaczający": UpdateMode.BoundingRectViewportUpdate,
+    "Pełne": UpdateMode.FullViewportUpdate,
+}
+
+def scene_to_json(scene):
+    data = []
+    for it in scene.items():
+        if hasattr(it, 'to_json'):
+            data.append(it.to_json())
+    return data
+
+def add_items_from_json(scene, data):
+    for obj in data:
+        t = obj.get('type')
+        if t == 'rect':
+            x = obj['x']
+            y = obj['y']
+            w = obj['w']
+            h = obj['h']
+            color = QtGui.QColor(obj['color']['r'], obj['color']['g'], obj['color']['b'])
+            rect = RectItem(w, h, color)
+            rect.setPos(x, y)
+            scene.addItem(rect)
+        elif t == 'ellipse':
+            x = obj['x']
+            y = obj['y']
+            w = obj['w']
+            h = obj['h']
+            color = QtGui.QColor(obj['color']['r'], obj['color']['g'], obj['color']['b'])
+            ellipse = EllipseItem(w, h, color)
+            ellipse.setPos(x, y)
+            scene.addItem(ellipse)
+        elif t == 'line':
+            p1 = QtCore.QPointF(obj['x1'], obj['y1'])
+            p2 = QtCore.QPointF(obj['x2'], obj['y2'])
+            color = QtGui.QColor(obj['color']['r'], obj['color']['g'], obj['color']['b'])
+            line = LineItem(p1, p2, color)
+            scene.addItem(line)
+
+def check_scene_data(data):
+    if not isinstance(data, list) or not all(isinstance(obj, dict) for obj in data):
+        raise ValueError("Nieprawidłowy format rysunku")
+
+def read_scene_file(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    check_scene_data(data)
+    return data
+
+def normalize_numbers(value):
+    if isinstance(value, dict):
+        return {k: normalize_numbers(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [normalize_numbers(v) for v in value]
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+def scene_hash(data):
+    # Canonical form (sorted keys, floats only) so the same drawing always gives the same key
+    canonical = json.dumps(normalize_numbers(data), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def render_scene_data(data, width, height):
+    scene = QtWidgets.QGraphicsScene()
+    scene.setSceneRect(0, 0, *SCENE_SIZE)
+    add_items_from_json(scene, data)
+    image = QtGui.QImage(width, height, QtGui.QImage.Format.Format_ARGB32)
+    image.fill(QtGui.QColor("white"))
+    painter = QtGui.QPainter(image)
+    painter.setRenderHint(QtGui.QPainter.RenderHint.Antialiasing)
+    scene.render(painter, QtCore.QRectF(0, 0, width, height), scene.sceneRect(),
+                 Qt.AspectRatioMode.KeepAspectRatio)
+    painter.end()
+    return image
+
+class RenderCache:
+    # Rendered scenes on disk, keyed by scene hash and render size.
+    # Least recently used images are removed once max_bytes is exceeded.
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.index_path = os.path.join(directory, 'index.json')
+        self.index = self.load_index()
+
+    def load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(index, dict):
+            return {}
+        for entry in index.values():
+            if not isinstance(entry, dict) or not {'mtime', 'size', 'hash'} <= entry.keys():
+                return {}
+        return {path: entry for path, entry in index.items() if os.path.isfile(path)}
+
+    def save_index(self):
+        with open(self.index_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f)
+
+    def image_path(self, key, width, height):
+        return os.path.join(self.directory, f"{key}_{width}x{height}.png")
+
+    def get(self, data, width, height, key=None):
+        key = key or scene_hash(data)
+        path = self.image_path(key, width, height)
+        image = self.lookup(path)
+        if image is None:
+            image = render_scene_data(data, width, height)
+            image.save(path, 'PNG')
+            self.evict()
+        return image
+
+    def lookup(self, path):
+        if not os.path.isfile(path):
+            return None
+        image = QtGui.QImage(path)
+        if image.isNull():
+            return None
+        os.utime(path)
+        return image
+
+    def remember_file(self, path, data):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        key = scene_hash(data)
+        self.index[path] = {'mtime': stat.st_mtime, 'size': stat.st_size, 'hash': key}
+        self.save_index()
+        return key
+
+    def get_for_file(self, path, width, height):
+        # Files that did not change since the last visit are served without parsing
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        entry = self.index.get(path)
+        if entry and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+            image = self.lookup(self.image_path(entry['hash'], width, height))
+            if image is not None:
+                return image
+        data = read_scene_file(path)
+        key = self.remember_file(path, data)
+        return self.get(data, width, height, key)
+
+    def thumbnail_for_file(self, path):
+        return self.get_for_file(path, *THUMBNAIL_SIZE)
+
+    def evict(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.png'):
+                stat = os.stat(os.path.join(self.directory, name))
+                files.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in files)
+        removed = set()
+        for _, size, name in sorted(files):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
+            removed.add(name)
+        kept = {name.split('_')[0] for _, _, name in files if name not in removed}
+
+        # Index entries without any cached image are useless, drop them
+        index = {path: entry for path, entry in self.index.items() if entry['hash'] in kept}
+        if len(index) != len(self.index):
+            self.index = index
+            self.save_index()
+
+def default_cache_dir():
+    base = QtCore.QStandardPaths.writableLocation(QtCore.QStandardPaths.StandardLocation.GenericCacheLocation)
+    return os.path.join(base, 'project-1', 'renders')
+
+def open_render_cache():
+    # The cache is optional, the editor works without it
+    try:
+        return RenderCache(default_cache_dir())
+    except Exception:
+        return None
+
+
 class MainWindow(QtWidgets.QMainWindow):
     def __init__(self):
         QtWidgets.QMainWindow.__init__(self)
@@ -347,11 +602,11 @@ class MainWindow(QtWidgets.QMainWindow):
         self.setFixedSize(800, 800)
 
         self.scene = CustomScene(mouse_press_callback=self.on_scene_mouse_press)
-        self.scene.setSceneRect(0, 0, 540, 780)
+        self.scene.setSceneRect(0, 0, *SCENE_SIZE)
         self.scene.selectionChanged.connect(self.on_scene_item_select)
-        view = QtWidgets.QGraphicsView(self.scene)
-        view.setFixedSize(550, 790)
-        self.setCentralWidget(view)
+        self.view = QtWidgets.QGraphicsView(self.scene)
+        self.view.setFixedSize(550, 790)
+        self.setCentralWidget(self.view)
 
         dock = QtWidgets.QDockWidget("Narzędzia", self)
         dock.setFeatures(QtWidgets.QDockWidget.DockWidgetFeature.NoDockWidgetFeatures)
@@ -454,13 +709,34 @@ class MainWindow(QtWidgets.QMainWindow):
         layout.addWidget(QtWidgets.QLabel('Podgląd koloru:'))
         layout.addWidget(self.color_preview)
 
+        layout.addSpacing(25)
+
+        # Repaint settings and paint cost
+        layout.addWidget(QtWidgets.QLabel('Odświeżanie widoku'))
+        self.update_mode_cbox = QtWidgets.QComboBox()
+        self.update_mode_cbox.addItems(list(VIEWPORT_UPDATE_MODES))
+        self.update_mode_cbox.currentTextChanged.connect(self.on_update_mode_changed)
+        layout.addWidget(self.update_mode_cbox)
+        stats_button = QtWidgets.QPushButton('Statystyki rysowania')
+        stats_button.clicked.connect(self.show_paint_stats)
+        layout.addWidget(stats_button)
+
         layout.addStretch()
         
         self.updating_color = False
         self.drawing_points = []
+        self.render_cache = open_render_cache()
         self.on_color_mode_changed("RGB")
+        self.on_update_mode_changed(self.update_mode_cbox.currentText())
         self.set_rgb(0, 0, 0)
 
+    def on_update_mode_changed(self, mode):
+        self.view.setViewportUpdateMode(VIEWPORT_UPDATE_MODES[mode])
+
+    def show_paint_stats(self):
+        QtWidgets.QMessageBox.information(self, 'Statystyki rysowania', paint_stats.summary())
+        paint_stats.reset()
+
     def on_color_mode_changed(self, mode):
         is_rgb = mode == "RGB"
         is_cmyk = mode == "CMYK"
@@ -595,16 +871,8 @@ class MainWindow(QtWidgets.QMainWindow):
         selected = self.scene.selectedItems()
         if len(selected) >= 1:
             item = selected[0]
-            if isinstance(item, LineItem):
-                item.p1 = QtCore.QPointF(params[0], params[1])
-                item.p2 = QtCore.QPointF(params[2], params[3])
-            elif isinstance(item, BaseGraphicsItem):    
-                item.setX(params[0])
-                item.setY(params[1])
-                item.width = params[2]
-                item.height = params[3]
-            item.update_handles()
-            self.scene.update()
+            if isinstance(item, BaseGraphicsItem):
+                item.set_params(params)
             return
          
 
@@ -630,55 +898,71 @@ class MainWindow(QtWidgets.QMainWindow):
     def save_to_file(self):
         path, _ = QtWidgets.QFileDialog.getSaveFileName(self, 'Zapisz rysunek', filter='JSON Files (*.json)')
         if not path: return
-        data = []
-        for it in self.scene.items():
-            if hasattr(it, 'to_json'):
-                data.append(it.to_json())
+        data = scene_to_json(self.scene)
         try:
             with open(path, 'w', encoding='utf-8') as f:
                 json.dump(data, f, indent=2)
         except Exception as e:
-            QtWidgets.QMessageBox.critical(self, 'Błąd zapisu', str(e))
+            QtWidgets.QMessageBox.critical(self, 'Błąd zapisu', str(e)); return
+
+        if self.render_cache is None: return
+        try:
+            key = self.render_cache.remember_file(path, data)
+            self.render_cache.get(data, *THUMBNAIL_SIZE, key)
+        except OSError:
+            pass
+
+    def show_file_preview(self, preview, path):
+        preview.clear()
+        if self.render_cache is None: return
+        if not path.endswith('.json') or not os.path.isfile(path): return
+        try:
+            image = self.render_cache.thumbnail_for_file(path)
+        except Exception:
+            return
+        preview.setPixmap(QtGui.QPixmap.fromImage(image))
 
     def load_from_file(self):
-        path, _ = QtWidgets.QFileDialog.getOpenFileName(self, 'Otwórz rysunek', filter='JSON Files (*.json)')
-        if not path: return
+        dialog = QtWidgets.QFileDialog(self, 'Otwórz rysunek', '', 'JSON Files (*.json)')
+        dialog.setOption(QtWidgets.QFileDialog.Option.DontUseNativeDialog, True)
+        dialog.setFileMode(QtWidgets.QFileDialog.FileMode.ExistingFile)
+        preview = QtWidgets.QLabel()
+        preview.setFixedSize(*THUMBNAIL_SIZE)
+        preview.setFrameShape(QtWidgets.QFrame.Shape.Box)
+        grid = dialog.layout()
+        grid.addWidget(preview, 0, grid.columnCount(), grid.rowCount(), 1)
+        dialog.currentChanged.connect(lambda p: self.show_file_preview(preview, p))
+        if not dialog.exec(): return
+        path = dialog.selectedFiles()[0]
         try:
-            with open(path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = read_scene_file(path)
         except Exception as e:
             QtWidgets.QMessageBox.critical(self, 'Błąd odczytu', str(e)); return
         
         self.scene.clear()
-        for obj in data:
-            t = obj.get('type')
-            if t == 'rect':
-                x = obj['x']
-                y = obj['y']
-                w = obj['w']
-                h = obj['h']
-                color = QtGui.QColor(obj['color']['r'], obj['color']['g'], obj['color']['b'])
-                rect = RectItem(w, h, color)
-                rect.setPos(x, y)
-                self.scene.addItem(rect)
-            elif t == 'ellipse':
-                x = obj['x']
-                y = obj['y']
-                w = obj['w']
-                h = obj['h']
-                color = QtGui.QColor(obj['color']['r'], obj['color']['g'], obj['color']['b'])
-                ellipse = EllipseItem(w, h, color)
-                ellipse.setPos(x, y)
-                self.scene.addItem(ellipse)
-            elif t == 'line':
-                p1 = QtCore.QPointF(obj['x1'], obj['y1'])
-                p2 = QtCore.QPointF(obj['x2'], obj['y2'])
-                color = QtGui.QColor(obj['color']['r'], obj['color']['g'], obj['color']['b'])
-                line = LineItem(p1, p2, color)
-                self.scene.addItem(line)
+        add_items_from_json(self.scene, data)
+
+def render_files(paths):
+    # Batch mode: python main.py --render a.json b.json -> a.png b.png
+    cache = open_render_cache()
+    for path in paths:
+        try:
+            if cache is not None:
+                image = cache.get_for_file(path, *SCENE_SIZE)
+            else:
+                image = render_scene_data(read_scene_file(path), *SCENE_SIZE)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            print(path + ": " + str(e), file=sys.stderr)
+            continue
+        out = os.path.splitext(path)[0] + '.png'
+        image.save(out, 'PNG')
+        print(path + " -> " + out)
 
 if __name__ == "__main__":
     app = QtWidgets.QApplication([])
+    if len(sys.argv) > 1 and sys.argv[1] == '--render':
+        render_files(sys.argv[2:])
+        sys.exit(0)
     window = MainWindow()
     window.show()
     print("Starting")